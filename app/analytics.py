@@ -1,40 +1,196 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterable, Optional, Tuple
+from collections import OrderedDict
+from functools import cached_property, wraps
 from datetime import datetime, timedelta
+import copy
+import threading
 import pandas as pd
 import numpy as np
 
+from .labels import CATEGORIES, encode_label_korean
+
+# 카테고리 분포 차트 색상
+CATEGORY_COLORS = {
+    '간식': '#ff6b6b',
+    '오락': '#4ecdc4',
+    '장난감': '#45b7d1',
+    '교육 및 문구': '#96ceb4',
+    '먹이': '#ff9f40',  # 오렌지색으로 게임 캐릭터 먹이 표시
+    '기타': '#ffeaa7'
+}
+
+# 대시보드 섹션 이름 (get_comprehensive_analysis 결과 키)
+DASHBOARD_SECTIONS = ('metrics', 'weeklyTrend', 'categoryData', 'hourlyData', 'popularProducts', 'alerts')
+
+# 분석 결과 캐시 (데이터 지문 + 분 단위 시각 기준, LRU)
+_RESULT_CACHE_SIZE = 32
+_result_cache: "OrderedDict[tuple, Any]" = OrderedDict()
+_result_cache_lock = threading.Lock()
+
+def _freeze(value: Any) -> Any:
+    """캐시 키로 쓸 수 있도록 dict/list 인자를 튜플로 변환"""
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+def _cached_result(method):
+    """같은 데이터에 대해 같은 분 안에서는 이전 분석 결과를 재사용"""
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        key = (method.__name__, self.fingerprint, _freeze(args), _freeze(kwargs))
+        with _result_cache_lock:
+            if key in _result_cache:
+                _result_cache.move_to_end(key)
+                return copy.deepcopy(_result_cache[key])
+        
+        result = method(self, *args, **kwargs)
+        with _result_cache_lock:
+            _result_cache[key] = result
+            _result_cache.move_to_end(key)
+            while len(_result_cache) > _RESULT_CACHE_SIZE:
+                _result_cache.popitem(last=False)
+        return copy.deepcopy(result)
+    return wrapper
+
+def _weekly_kernel(ts: np.ndarray, codes: np.ndarray, amounts: np.ndarray,
+                   today: np.datetime64) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    이번 주 구매를 한 번 훑어 (일자 x 카테고리) 합계와 시간대별 구매 건수를 함께 계산
+    
+    Returns:
+        (day_cat, hourly): day_cat[0]은 6일 전, day_cat[6]은 오늘
+    """
+    n_cat = len(CATEGORIES)
+    
+    # 일자 인덱스 (6일 전 = 0, 오늘 = 6)와 카테고리 코드를 하나의 bin으로 결합
+    day_index = (ts.astype('datetime64[D]') - today).astype(np.int64) + 6
+    in_range = (day_index >= 0) & (day_index < 7)
+    bins = day_index[in_range] * n_cat + codes[in_range]
+    day_cat = np.bincount(bins, weights=amounts[in_range], minlength=7 * n_cat).reshape(7, n_cat)
+    
+    hours = ts.astype('datetime64[h]').astype(np.int64) % 24
+    hourly = np.bincount(hours, minlength=24)
+    return day_cat.astype(np.int64), hourly
+
 # 데이터 분석 클래스
 class PurchaseAnalyzer:
-    def __init__(self, df: pd.DataFrame):
-        self.df = df.copy()
-        self.now = datetime.now()
+    def __init__(self, df: pd.DataFrame, now: Optional[datetime] = None):
+        self.df = df
+        self.now = now or datetime.now()
         self.one_week_ago = self.now - timedelta(days=7)
         self.two_weeks_ago = self.now - timedelta(days=14)
         
+        # 최근 7일 요일 이름 (6일 전 ~ 오늘, weekday()는 월=0이므로 +1 해서 일=0 기준으로 맞춤)
+        days = ['일', '월', '화', '수', '목', '금', '토']
+        self._day_names = [days[((self.now - timedelta(days=i)).weekday() + 1) % 7] for i in range(6, -1, -1)]
+        
+        self._this_week = self.df
+        self._last_week = self.df
+        self._two_weeks = self.df
+        self._has_data = len(self.df) > 0
+        
         # 데이터 전처리
-        if not self.df.empty:
-            # 총액 계산 컬럼 추가
-            self.df['total_amount'] = self.df['price'] * self.df['cnt']
+        if self._has_data:
+            # 시간순 정렬 (정렬 결과가 새 DataFrame이므로 별도 copy 없이 컬럼 추가 가능)
+            self.df = self.df.sort_values('timestamp', kind='stable', ignore_index=True)
             
-            # label을 한국어 카테고리로 변환
-            label_korean_mapping = {
-                'FOOD': '먹이',      # 게임 캐릭터 먹이를 별도 카테고리로 분류
-                'SNACK': '간식',
-                'ENTERTAINMENT': '오락',
-                'TOY': '장난감',
-                'EDUCATION': '교육 및 문구',
-                'ETC': '기타'
-            }
+            # 총액 계산 컬럼 추가 (원 단위 정수이므로 int64로 고정, 로더가 이미 계산했으면 재사용)
+            if 'total_amount' not in self.df.columns:
+                self.df['total_amount'] = self.df['price'].to_numpy(np.int64) * self.df['cnt'].to_numpy(np.int64)
             
-            # label_korean 컬럼 생성
-            if 'label' in self.df.columns:
-                self.df['label_korean'] = self.df['label'].map(label_korean_mapping).fillna('기타')
-            else:
-                self.df['label_korean'] = '기타'
+            # 한국어 카테고리 Categorical (로더가 이미 인코딩했으면 재사용)
+            label_korean = self.df.get('label_korean')
+            already_encoded = (
+                label_korean is not None
+                and isinstance(label_korean.dtype, pd.CategoricalDtype)
+                and list(label_korean.cat.categories) == CATEGORIES
+            )
+            if not already_encoded:
+                if 'label' in self.df.columns:
+                    self.df['label_korean'] = encode_label_korean(self.df['label'])
+                else:
+                    self.df['label_korean'] = pd.Categorical.from_codes(
+                        np.full(len(self.df), CATEGORIES.index('기타')), categories=CATEGORIES
+                    )
+            
+            # 주간 구간 캐싱: 이진 탐색으로 구간 경계 계산 (NaT는 맨 뒤로 정렬됨)
+            ts = self.df['timestamp'].values
+            start = ts.searchsorted(np.datetime64(self.two_weeks_ago))
+            mid = ts.searchsorted(np.datetime64(self.one_week_ago))
+            end = ts.searchsorted(np.datetime64('NaT'))
+            self._this_week = self.df.iloc[mid:end]
+            self._last_week = self.df.iloc[start:mid]
+            self._two_weeks = self.df.iloc[start:end]
+        
+        # 구간 비어있음 여부는 분석기 수명 동안 불변이므로 한 번만 계산
+        self._has_this_week = len(self._this_week) > 0
+        self._has_two_weeks = len(self._two_weeks) > 0
+    
+    @cached_property
+    def fingerprint(self) -> tuple:
+        """결과 캐시 키로 쓰는 데이터 지문 (행 수, 분석에 쓰이는 컬럼의 내용 해시, 분 단위 현재 시각)"""
+        minute = self.now.replace(second=0, microsecond=0)
+        if not self._has_data:
+            return (0, 0, minute)
+        
+        # 행별 해시의 합 (uint64 오버플로는 그대로 순환)
+        columns = ['timestamp', 'name', 'label_korean', 'price', 'cnt']
+        row_hashes = pd.util.hash_pandas_object(self.df[columns], index=False).to_numpy()
+        return (len(self.df), int(row_hashes.sum()), minute)
+    
+    @cached_property
+    def _weekly_aggregates(self) -> Tuple[np.ndarray, np.ndarray]:
+        """일자 x 카테고리 합계와 시간대별 건수 (트렌드/시간대 패턴에서 공유)"""
+        if not self._has_this_week:
+            return np.zeros((7, len(CATEGORIES)), dtype=np.int64), np.zeros(24, dtype=np.int64)
+        
+        return _weekly_kernel(
+            self._this_week['timestamp'].values,
+            self._this_week['label_korean'].cat.codes.to_numpy(),
+            self._this_week['total_amount'].to_numpy(),
+            np.datetime64(self.now.date())
+        )
+    
+    @cached_property
+    def _window_totals(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        지난 주/이번 주 카테고리별 총액과 건수를 2주 구간 한 번의 패스로 계산
         
+        Returns:
+            (amounts, counts): 각각 (2, 카테고리 수) 배열, 0행은 지난 주, 1행은 이번 주
+        """
+        n_cat = len(CATEGORIES)
+        if not self._has_two_weeks:
+            return np.zeros((2, n_cat), dtype=np.int64), np.zeros((2, n_cat), dtype=np.int64)
+        
+        # 구간(지난 주 = 0, 이번 주 = 1)과 카테고리 코드를 하나의 bin으로 결합
+        window = (np.arange(len(self._two_weeks)) >= len(self._last_week)).astype(np.int64)
+        bins = window * n_cat + self._two_weeks['label_korean'].cat.codes.to_numpy()
+        amounts = np.bincount(bins, weights=self._two_weeks['total_amount'].to_numpy(), minlength=2 * n_cat)
+        counts = np.bincount(bins, minlength=2 * n_cat)
+        return amounts.astype(np.int64).reshape(2, n_cat), counts.reshape(2, n_cat)
+    
+    @cached_property
+    def weekly_totals(self) -> Tuple[int, pd.Series]:
+        """이번 주 총액과 카테고리별 총액 (메트릭/알림에서 공유)"""
+        amounts, counts = self._window_totals
+        observed = counts[1] > 0
+        # 응답의 카테고리 순서와 인기 카테고리 동률 처리를 기존과 같게 유지하기 위해 이름(유니코드) 순으로 정렬
+        category_amounts = pd.Series(amounts[1][observed], index=np.array(CATEGORIES)[observed], dtype='int64').sort_index()
+        return int(amounts[1].sum()), category_amounts
+    
+    @cached_property
+    def last_week_total(self) -> int:
+        """지난 주 총액"""
+        amounts, _ = self._window_totals
+        return int(amounts[0].sum())
+    
+    @_cached_result
     def get_weekly_metrics(self) -> Dict[str, Any]:
         """주간 메트릭 계산"""
-        if self.df.empty:
+        if not self._has_data:
             return {            'thisWeekTotal': 0,
             'weeklyChange': 0.0,
             'mostPopularCategory': "데이터 없음",
@@ -43,16 +199,9 @@ class PurchaseAnalyzer:
             'avgPurchaseAmount': 0.0
             }
             
-        # 이번 주 데이터
-        this_week = self.df[self.df['timestamp'] >= self.one_week_ago]
-        last_week = self.df[
-            (self.df['timestamp'] >= self.two_weeks_ago) & 
-            (self.df['timestamp'] < self.one_week_ago)
-        ]
-        
         # 총 소비액
-        this_week_total = this_week['total_amount'].sum() if not this_week.empty else 0
-        last_week_total = last_week['total_amount'].sum() if not last_week.empty else 0
+        this_week_total, category_amounts = self.weekly_totals
+        last_week_total = self.last_week_total
         
         # 변화율 계산
         weekly_change = 0.0
@@ -60,21 +209,16 @@ class PurchaseAnalyzer:
             weekly_change = ((this_week_total - last_week_total) / last_week_total) * 100
             
         # 가장 인기 카테고리
-        most_popular = "데이터 없음"
-        if not this_week.empty:
-            # label_korean을 사용하여 카테고리별 총액 계산
-            category_amounts = this_week.groupby('label_korean')['total_amount'].sum()
-            if not category_amounts.empty:
-                most_popular = category_amounts.idxmax()
+        most_popular = category_amounts.idxmax() if not category_amounts.empty else "데이터 없음"
         
         # 교육 아이템 비중
         education_ratio = 0.0
-        if not this_week.empty and this_week_total > 0:
-            education_amount = this_week[this_week['label_korean'] == '교육 및 문구']['total_amount'].sum()
+        if this_week_total > 0:
+            education_amount = category_amounts.get('교육 및 문구', 0)
             education_ratio = (education_amount / this_week_total * 100)
         
         # 평균 구매액
-        total_purchases = len(this_week)
+        total_purchases = len(self._this_week)
         avg_amount = float(this_week_total / total_purchases) if total_purchases > 0 else 0.0
         
         return {
@@ -86,121 +230,95 @@ class PurchaseAnalyzer:
             'avgPurchaseAmount': round(float(avg_amount), 2)
         }
     
+    @_cached_result
     def get_weekly_trend(self) -> List[Dict[str, Any]]:
         """주간 일별 트렌드 분석"""
         trend_data = []
-        days = ['일', '월', '화', '수', '목', '금', '토']
         
-        for i in range(6, -1, -1):
-            target_date = self.now - timedelta(days=i)
-            day_name = days[target_date.weekday() + 1 if target_date.weekday() != 6 else 0]
-            
-            # 해당 날짜 데이터 필터링
-            day_data = self.df[
-                self.df['timestamp'].dt.date == target_date.date()
-            ]
-            
+        # 일자 x 카테고리 합계 (한 번의 패스로 계산된 결과 사용)
+        day_cat, _ = self._weekly_aggregates
+        
+        # tolist()로 한 번에 파이썬 int로 변환해 카테고리별 int() 호출 제거
+        for day_name, category_sums in zip(self._day_names, day_cat.tolist()):
             # 카테고리별 합계
             day_result = {'day': day_name}
-            
-            if not day_data.empty:
-                category_sums = day_data.groupby('label_korean')['total_amount'].sum()
-                # 모든 카테고리 포함 (먹이 카테고리 추가)
-                categories = ['간식', '오락', '장난감', '교육 및 문구', '먹이', '기타']
-                for category in categories:
-                    day_result[category] = int(category_sums.get(category, 0))
-            else:
-                for category in ['간식', '오락', '장난감', '교육 및 문구', '먹이', '기타']:
-                    day_result[category] = 0
-                
+            day_result.update(zip(CATEGORIES, category_sums))
             trend_data.append(day_result)
             
         return trend_data
     
+    @_cached_result
     def get_category_distribution(self) -> List[Dict[str, Any]]:
         """카테고리별 분포 분석"""
-        this_week = self.df[self.df['timestamp'] >= self.one_week_ago]
-        
-        if this_week.empty:
+        if not self._has_this_week:
             return []
         
-        category_amounts = this_week.groupby('label_korean')['total_amount'].sum()
+        # 카테고리별 총액은 NumPy 집계 결과(weekly_totals)를 재사용
+        _, category_amounts = self.weekly_totals
             
-        colors = {
-            '간식': '#ff6b6b',
-            '오락': '#4ecdc4',
-            '장난감': '#45b7d1',
-            '교육 및 문구': '#96ceb4',
-            '먹이': '#ff9f40',  # 오렌지색으로 게임 캐릭터 먹이 표시
-            '기타': '#ffeaa7'
-        }
-        
-        result = []
-        for category, amount in category_amounts.items():
-            result.append({
+        return [
+            {
                 'name': category,
                 'value': int(amount),
-                'color': colors.get(category, '#gray')
-            })
-            
-        return result
+                'color': CATEGORY_COLORS.get(category, '#gray')
+            }
+            for category, amount in category_amounts.items()
+        ]
     
+    @_cached_result
     def get_hourly_pattern(self) -> List[Dict[str, Any]]:
         """시간대별 구매 패턴"""
-        this_week = self.df[self.df['timestamp'] >= self.one_week_ago]
-        
-        hourly_data = []
-        if not this_week.empty:
-            hourly_counts = this_week.groupby(this_week['timestamp'].dt.hour).size()
-            for hour in range(24):
-                hourly_data.append({
-                    'hour': f'{hour}시',
-                    'purchases': int(hourly_counts.get(hour, 0))
-                })
-        else:
-            for hour in range(24):
-                hourly_data.append({
-                    'hour': f'{hour}시',
-                    'purchases': 0
-                })
+        # 24칸 고정 히스토그램 (한 번의 패스로 계산된 결과 사용)
+        _, hourly_counts = self._weekly_aggregates
             
-        return hourly_data
+        return [
+            {'hour': f'{hour}시', 'purchases': int(hourly_counts[hour])}
+            for hour in range(24)
+        ]
     
+    @_cached_result
     def get_popular_products(self, limit: int = 8) -> List[Dict[str, Any]]:
         """인기 상품 분석"""
-        this_week = self.df[self.df['timestamp'] >= self.one_week_ago]
+        this_week = self._this_week
         
-        if this_week.empty:
+        if not self._has_this_week:
             return []
         
-        # 상품별 집계
-        product_stats = this_week.groupby(['name', 'label_korean']).agg({
-            'cnt': 'sum',
-            'total_amount': 'sum',
-            'price': 'mean'
-        }).reset_index()
-        product_stats.rename(columns={'label_korean': 'category'}, inplace=True)
+        # 상품별 집계 (수량 내림차순, 수량이 같으면 상품명 오름차순으로 순서 고정)
+        product_stats = (
+            this_week.groupby(['name', 'label_korean'], observed=True)
+            .agg(cnt=('cnt', 'sum'), total_amount=('total_amount', 'sum'))
+            .reset_index()
+            .sort_values(['cnt', 'name'], ascending=[False, True], kind='stable')
+            .head(limit)
+        )
         
-        product_stats = product_stats.sort_values('cnt', ascending=False).head(limit)
+        # iterrows 대신 컬럼 배열을 직접 사용
+        names = product_stats['name'].to_numpy()
+        categories = product_stats['label_korean'].to_numpy()  # 이미 한국어로 매핑된 카테고리 사용
+        counts = product_stats['cnt'].to_numpy()
+        totals = product_stats['total_amount'].to_numpy()
+        # 평균 단가는 이미 집계된 총액/수량에서 도출 (상위 limit개 행에 대해서만 계산)
+        prices = totals / np.maximum(counts, 1)
         
         return [
             {
-                'name': row['name'],
-                'category': row['category'],  # 이미 한국어로 매핑된 카테고리 사용
-                'count': int(row['cnt']),
-                'totalAmount': int(row['total_amount']),
-                'avgPrice': round(float(row['price']), 1)
+                'name': names[i],
+                'category': categories[i],
+                'count': int(counts[i]),
+                'totalAmount': int(totals[i]),
+                'avgPrice': round(float(prices[i]), 1)
             }
-            for _, row in product_stats.iterrows()
+            for i in range(len(product_stats))
         ]
     
+    @_cached_result
     def generate_alerts(self, metrics: Dict[str, Any]) -> List[Dict[str, str]]:
         """개선된 알림 생성"""
         alerts = []
-        this_week = self.df[self.df['timestamp'] >= self.one_week_ago]
         
         # 데이터 없음 처리
-        if this_week.empty:
+        if not self._has_this_week:
             alerts.append({
                 'type': 'info',
                 'title': '첫 구매를 시작해보세요',
@@ -208,92 +326,73 @@ class PurchaseAnalyzer:
             })
             return alerts
             
-        # 카테고리별 비중 계산
-        total_amount = this_week['total_amount'].sum()
-        if total_amount > 0:
-            category_ratios = this_week.groupby('label_korean')['total_amount'].sum() / total_amount
+        # 카테고리별 비중 계산 (구매액이 없으면 비중 관련 알림은 건너뜀)
+        total_amount, category_amounts = self.weekly_totals
+        has_amount = total_amount > 0
+        category_ratios = category_amounts / total_amount if has_amount else category_amounts
+        snack_ratio = category_ratios.get('간식', 0)
+        food_ratio = category_ratios.get('먹이', 0)
+        ratio_values = category_ratios.to_numpy()
+        balanced_categories = int(((ratio_values >= 0.1) & (ratio_values <= 0.4)).sum())
+        
+        education_ratio = metrics.get('educationRatio', 0)
+        weekly_change = metrics.get('weeklyChange', 0)
+        total_purchases = metrics.get('totalPurchases', 0)
+        
+        # 알림 규칙 테이블: (조건, 타입, 제목, 메시지)
+        rules = [
             # 간식 과다 소비 체크
-            snack_ratio = category_ratios.get('간식', 0)
-            if snack_ratio > 0.5:
-                alerts.append({
-                    'type': 'warning',
-                    'title': '간식 소비 주의',
-                    'message': f'이번 주 간식 구매가 전체의 {snack_ratio*100:.0f}%를 넘었어요. 균형 잡힌 소비를 권장해요!'
-                })
-            elif snack_ratio > 0.4:
-                alerts.append({
-                    'type': 'warning',
-                    'title': '간식 소비 주의',
-                    'message': f'이번 주 간식 구매가 전체의 {snack_ratio*100:.0f}%를 넘었어요. 균형 잡힌 소비를 권장해요!'
-                })
-            
+            (has_amount and snack_ratio > 0.4, 'warning', '간식 소비 주의',
+             f'이번 주 간식 구매가 전체의 {snack_ratio*100:.0f}%를 넘었어요. 균형 잡힌 소비를 권장해요!'),
             # 게임 캐릭터 먹이 소비 체크
-            food_ratio = category_ratios.get('먹이', 0)
-            if food_ratio > 0.3:
-                alerts.append({
-                    'type': 'info',
-                    'title': '게임 먹이 관리',
-                    'message': f'게임 캐릭터 먹이 구매가 전체의 {food_ratio*100:.0f}%예요. 게임 시간과 함께 관리해보세요! 🎮'
-                })
-            elif food_ratio > 0.15:
-                alerts.append({
-                    'type': 'info',
-                    'title': '게임 균형 유지',
-                    'message': '게임 캐릭터를 잘 돌보고 있어요. 다른 활동과 균형을 맞춰보세요! 🐾'
-                })
-            
+            (has_amount and food_ratio > 0.3, 'info', '게임 먹이 관리',
+             f'게임 캐릭터 먹이 구매가 전체의 {food_ratio*100:.0f}%예요. 게임 시간과 함께 관리해보세요! 🎮'),
+            (has_amount and 0.15 < food_ratio <= 0.3, 'info', '게임 균형 유지',
+             '게임 캐릭터를 잘 돌보고 있어요. 다른 활동과 균형을 맞춰보세요! 🐾'),
             # 교육 아이템 관련 알림
-            education_ratio = metrics.get('educationRatio', 0)
-            if education_ratio >= 30:
-                alerts.append({
-                    'type': 'success',
-                    'title': '교육 아이템 우수',
-                    'message': '교육 관련 구매 비중이 목표치를 달성했어요! 🎉'
-                })
-            elif education_ratio >= 20:
-                alerts.append({
-                    'type': 'success',
-                    'title': '교육 목표 달성',
-                    'message': '교육 아이템 구매 목표를 달성했어요! 🎓'
-                })
-            elif education_ratio < 10:
-                alerts.append({
-                    'type': 'info',
-                    'title': '교육 아이템 추천',
-                    'message': '교육 관련 구매가 적어요. 학습 도서나 교육 도구를 고려해보세요!'
-                })
-            
+            (has_amount and education_ratio >= 30, 'success', '교육 아이템 우수',
+             '교육 관련 구매 비중이 목표치를 달성했어요! 🎉'),
+            (has_amount and 20 <= education_ratio < 30, 'success', '교육 목표 달성',
+             '교육 아이템 구매 목표를 달성했어요! 🎓'),
+            (has_amount and education_ratio < 10, 'info', '교육 아이템 추천',
+             '교육 관련 구매가 적어요. 학습 도서나 교육 도구를 고려해보세요!'),
             # 균형잡힌 소비 체크
-            balanced_categories = sum(1 for ratio in category_ratios.values if 0.1 <= ratio <= 0.4)
-            if balanced_categories >= 4:
-                alerts.append({
-                    'type': 'success',
-                    'title': '균형잡힌 소비',
-                    'message': '모든 카테고리에서 균형잡힌 소비를 보이고 있어요! 👏'
-                })
-        
-        # 주간 변화 관련 알림
-        weekly_change = metrics.get('weeklyChange', 0)
-        if weekly_change < -15:
-            alerts.append({
-                'type': 'success',
-                'title': '절약 성공',
-                'message': f'지난 주보다 소비가 {abs(weekly_change):.1f}% 줄었어요. 훌륭한 절약 습관이에요! 🎉'
-            })
-        elif weekly_change > 30:
-            alerts.append({
-                'type': 'warning',
-                'title': '소비 증가 주의',
-                'message': f'지난 주보다 소비가 {weekly_change:.1f}% 늘었어요. 소비 패턴을 점검해보세요.'
-            })
+            (has_amount and balanced_categories >= 4, 'success', '균형잡힌 소비',
+             '모든 카테고리에서 균형잡힌 소비를 보이고 있어요! 👏'),
+            # 주간 변화 관련 알림
+            (weekly_change < -15, 'success', '절약 성공',
+             f'지난 주보다 소비가 {abs(weekly_change):.1f}% 줄었어요. 훌륭한 절약 습관이에요! 🎉'),
+            (weekly_change > 30, 'warning', '소비 증가 주의',
+             f'지난 주보다 소비가 {weekly_change:.1f}% 늘었어요. 소비 패턴을 점검해보세요.'),
+            # 구매 빈도 체크
+            (total_purchases > 50, 'info', '구매 빈도 점검',
+             f'이번 주 총 {total_purchases}번 구매했어요. 충동 구매는 줄이고 계획적으로 구매해보세요.'),
+        ]
         
-        # 구매 빈도 체크
-        total_purchases = metrics.get('totalPurchases', 0)
-        if total_purchases > 50:
-            alerts.append({
-                'type': 'info',
-                'title': '구매 빈도 점검',
-                'message': f'이번 주 총 {total_purchases}번 구매했어요. 충동 구매는 줄이고 계획적으로 구매해보세요.'
-            })
-            
+        alerts.extend(
+            {'type': alert_type, 'title': title, 'message': message}
+            for condition, alert_type, title, message in rules if condition
+        )
         return alerts
+
+    def get_comprehensive_analysis(self, sections: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+        """
+        대시보드에 필요한 분석 결과를 한 번에 생성 (공유 집계를 한 번만 계산)
+        
+        sections가 주어지면 해당 섹션만 계산하고 나머지는 빈 리스트로 채움
+        (metrics는 응답 필수 항목이자 알림 계산에 쓰이므로 항상 포함)
+        """
+        sections = set(DASHBOARD_SECTIONS if sections is None else sections)
+        metrics = self.get_weekly_metrics()
+        builders = {
+            'weeklyTrend': self.get_weekly_trend,
+            'categoryData': self.get_category_distribution,
+            'hourlyData': self.get_hourly_pattern,
+            'popularProducts': self.get_popular_products,
+            'alerts': lambda: self.generate_alerts(metrics)
+        }
+        
+        analysis = {'metrics': metrics}
+        for name, build in builders.items():
+            analysis[name] = build() if name in sections else []
+        return analysis
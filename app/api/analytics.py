@@ -1,85 +1,228 @@
-from fastapi import APIRouter, HTTPException, Query
-from datetime import datetime, timedelta
+from fastapi import APIRouter, HTTPException, Query, Response
+from datetime import datetime
+from collections import OrderedDict
+from typing import Dict, FrozenSet, List, Optional, Tuple
+import asyncio
+import json
+import time
 import pandas as pd
 
-from ..database import get_purchase_data, get_purchase_data_async, async_collection
+from ..database import get_purchase_dataframe_async, get_children_async, async_collection, get_data_version
 from ..models import (
     DashboardResponse, DashboardMetrics, WeeklyTrendItem,
     CategoryData, HourlyData, PopularProduct, AlertItem,
     ChildrenResponse, ChildInfo, HealthResponse
 )
-from ..analytics import PurchaseAnalyzer
+from ..analytics import PurchaseAnalyzer, DASHBOARD_SECTIONS
 
 router = APIRouter(prefix="/api", tags=["analytics"])
 
+# 분석기가 실제로 사용하는 최대 기간 (이번 주 + 지난 주)
+ANALYSIS_WINDOW_DAYS = 14
+
+# 헬스 체크 DB 응답 대기 시간
+HEALTH_CHECK_TIMEOUT = 1.0  # 초
+
+# 대시보드 응답 캐시: (child_id, days, 데이터 버전, 포함 섹션) -> (만료 시각, 직렬화된 JSON 응답)
+DASHBOARD_CACHE_TTL = 60  # 초
+DASHBOARD_CACHE_SIZE = 1024
+DashboardCacheKey = Tuple[str, int, int, FrozenSet[str]]
+_dashboard_cache: "OrderedDict[DashboardCacheKey, Tuple[float, bytes]]" = OrderedDict()
+
+# 같은 키에 대한 동시 요청이 한 번만 계산하도록 키별 잠금 (thundering herd 방지)
+_dashboard_locks: Dict[DashboardCacheKey, asyncio.Lock] = {}
+
+# 데이터가 없을 때의 응답 템플릿 (lastUpdated만 요청마다 교체)
+_EMPTY_DASHBOARD = DashboardResponse(
+    metrics=DashboardMetrics(
+        thisWeekTotal=0,
+        weeklyChange=0.0,
+        mostPopularCategory="데이터 없음",
+        educationRatio=0.0,
+        totalPurchases=0,
+        avgPurchaseAmount=0.0
+    ),
+    weeklyTrend=[],
+    categoryData=[],
+    hourlyData=[],
+    popularProducts=[],
+    alerts=[{
+        'type': 'info',
+        'title': '첫 구매를 시작해보세요',
+        'message': '아직 구매 데이터가 없어요!'
+    }],
+    lastUpdated=datetime.now()
+)
+
+def _get_cached_dashboard(key: DashboardCacheKey) -> Optional[bytes]:
+    """만료되지 않은 캐시 응답 반환"""
+    entry = _dashboard_cache.get(key)
+    if entry is None:
+        return None
+    
+    expires_at, body = entry
+    if expires_at < time.monotonic():
+        del _dashboard_cache[key]
+        return None
+    
+    _dashboard_cache.move_to_end(key)
+    return body
+
+def _set_cached_dashboard(key: DashboardCacheKey, body: bytes) -> None:
+    """응답을 캐시에 저장 (가장 오래 사용되지 않은 항목부터 제거)"""
+    _dashboard_cache[key] = (time.monotonic() + DASHBOARD_CACHE_TTL, body)
+    _dashboard_cache.move_to_end(key)
+    while len(_dashboard_cache) > DASHBOARD_CACHE_SIZE:
+        _dashboard_cache.popitem(last=False)
+
+async def _build_dashboard_response(child_id: str, days: int, sections: FrozenSet[str]) -> DashboardResponse:
+    """대시보드 응답 생성 (DB 조회 + 분석)"""
+    # 분석 기준 시각과 응답 시각을 일치시키기 위해 한 번만 조회
+    now = datetime.now()
+    
+    # MongoDB에서 데이터 조회 (분석에 쓰이지 않는 2주 이전 데이터는 DB에서 걸러냄)
+    df = await get_purchase_dataframe_async(child_id=child_id, days=min(days, ANALYSIS_WINDOW_DAYS))
+    
+    return await _analyze_dashboard(df, now, sections)
+
+async def _analyze_dashboard(df: pd.DataFrame, now: datetime, sections: FrozenSet[str]) -> DashboardResponse:
+    """조회된 구매 데이터로 대시보드 응답 생성"""
+    if df.empty:
+        # 빈 데이터 응답 (미리 만든 템플릿에서 갱신 시각만 교체)
+        update = {'lastUpdated': now}
+        if 'alerts' not in sections:
+            update['alerts'] = []
+        return _EMPTY_DASHBOARD.model_copy(update=update)
+    
+    # 분석기 생성 후 전체 분석을 한 번에 수행 (이벤트 루프 블로킹 방지를 위해 스레드에서 실행)
+    analyzer = PurchaseAnalyzer(df, now=now)
+    analysis = await asyncio.to_thread(analyzer.get_comprehensive_analysis, sections)
+    
+    # 분석기 결과는 내부에서 만든 신뢰할 수 있는 값이므로 검증 없이 모델 생성
+    # 메트릭
+    metrics = DashboardMetrics.model_construct(**analysis['metrics'])
+    
+    # 주간 트렌드
+    weekly_trend = [WeeklyTrendItem.model_construct(**item) for item in analysis['weeklyTrend']]
+    
+    # 카테고리 분포
+    category_data = [CategoryData.model_construct(**item) for item in analysis['categoryData']]
+    
+    # 시간대별 패턴
+    hourly_data = [HourlyData.model_construct(**item) for item in analysis['hourlyData']]
+    
+    # 인기 상품
+    popular_products = [PopularProduct.model_construct(**item) for item in analysis['popularProducts']]
+    
+    # 알림 생성
+    alerts = [AlertItem.model_construct(**alert) for alert in analysis['alerts']]
+    
+    return DashboardResponse.model_construct(
+        metrics=metrics,
+        weeklyTrend=weekly_trend,
+        categoryData=category_data,
+        hourlyData=hourly_data,
+        popularProducts=popular_products,
+        alerts=alerts,
+        lastUpdated=now
+    )
+
+def _parse_sections(include: Optional[str]) -> FrozenSet[str]:
+    """include 파라미터(쉼표 구분)를 섹션 집합으로 변환 (없으면 전체 섹션)"""
+    if include is None:
+        return frozenset(DASHBOARD_SECTIONS)
+    
+    sections = frozenset(section.strip() for section in include.split(',') if section.strip())
+    unknown = sections.difference(DASHBOARD_SECTIONS)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"알 수 없는 섹션입니다: {', '.join(sorted(unknown))}")
+    return sections
+
 @router.get("/dashboard/{child_id}", response_model=DashboardResponse)
 async def get_dashboard_data(
     child_id: str,
-    days: int = Query(7, description="분석할 일수", ge=1, le=365)
+    days: int = Query(7, description="분석할 일수", ge=1, le=365),
+    include: Optional[str] = Query(None, description="계산할 섹션 (쉼표 구분, 기본 전체)")
 ):
     """
     대시보드 데이터 조회
     - child_id: 아이 식별자
     - days: 분석할 기간 (기본 7일)
+    - include: 계산할 섹션 (예: metrics,weeklyTrend, 제외된 목록 섹션은 빈 리스트)
     """
+    sections = _parse_sections(include)
+    
     try:
-        # MongoDB에서 데이터 조회
-        df = get_purchase_data(child_id=child_id, days=days)
-        
-        if df.empty:
-            # 빈 데이터 응답
-            return DashboardResponse(
-                metrics=DashboardMetrics(
-                    thisWeekTotal=0,
-                    weeklyChange=0.0,
-                    mostPopularCategory="데이터 없음",
-                    educationRatio=0.0,
-                    totalPurchases=0,
-                    avgPurchaseAmount=0.0
-                ),
-                weeklyTrend=[],
-                categoryData=[],
-                hourlyData=[],
-                popularProducts=[],
-                alerts=[{
-                    'type': 'info',
-                    'title': '첫 구매를 시작해보세요',
-                    'message': '아직 구매 데이터가 없어요!'
-                }],
-                lastUpdated=datetime.now()
-            )
+        # 캐시 확인 (구매는 외부 서비스가 기록하므로 TTL 만료가 주된 무효화, 버전은 이 프로세스의 삽입만 반영)
+        cache_key = (child_id, days, get_data_version(), sections)
+        body = _get_cached_dashboard(cache_key)
         
-        # 분석기 생성
-        analyzer = PurchaseAnalyzer(df)
+        if body is None:
+            lock = _dashboard_locks.setdefault(cache_key, asyncio.Lock())
+            try:
+                async with lock:
+                    # 잠금을 기다리는 동안 다른 요청이 이미 계산했을 수 있음
+                    body = _get_cached_dashboard(cache_key)
+                    if body is None:
+                        # 조회 실패 시 예외가 그대로 전달되어 캐시에 저장되지 않고 500으로 응답
+                        response = await _build_dashboard_response(child_id, days, sections)
+                        body = response.model_dump_json(by_alias=True).encode()
+                        _set_cached_dashboard(cache_key, body)
+            finally:
+                if _dashboard_locks.get(cache_key) is lock and not lock.locked():
+                    del _dashboard_locks[cache_key]
         
-        # 메트릭 계산
-        metrics_data = analyzer.get_weekly_metrics()
-        metrics = DashboardMetrics(**metrics_data)
+        # 직렬화된 JSON을 그대로 반환 (캐시 적중 시 모델 직렬화 생략)
+        return Response(content=body, media_type="application/json")
         
-        # 주간 트렌드
-        weekly_trend = [WeeklyTrendItem(**item) for item in analyzer.get_weekly_trend()]
-        
-        # 카테고리 분포
-        category_data = [CategoryData(**item) for item in analyzer.get_category_distribution()]
-        
-        # 시간대별 패턴
-        hourly_data = [HourlyData(**item) for item in analyzer.get_hourly_pattern()]
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"대시보드 데이터 조회 중 오류가 발생했습니다: {str(e)}")
+
+@router.get("/dashboard", response_model=Dict[str, DashboardResponse])
+async def get_dashboard_data_batch(
+    child_ids: List[str] = Query(..., description="아이 식별자 목록 (반복 지정 또는 쉼표 구분)"),
+    days: int = Query(7, description="분석할 일수", ge=1, le=365),
+    include: Optional[str] = Query(None, description="계산할 섹션 (쉼표 구분, 기본 전체)")
+):
+    """
+    여러 아이의 대시보드 데이터를 한 번에 조회
+    - child_ids: 아이 식별자 목록 (예: ?child_ids=a,b,c)
+    - days: 분석할 기간 (기본 7일)
+    - include: 계산할 섹션 (예: metrics,weeklyTrend, 제외된 목록 섹션은 빈 리스트)
+    """
+    sections = _parse_sections(include)
+    
+    try:
+        # 쉼표 구분 값 펼치기 (순서 유지, 중복 제거)
+        ids = list(dict.fromkeys(
+            child_id.strip() for value in child_ids for child_id in value.split(',') if child_id.strip()
+        ))
         
-        # 인기 상품
-        popular_products = [PopularProduct(**item) for item in analyzer.get_popular_products()]
+        # 캐시에 있는 아이는 그대로 사용하고, 나머지만 한 번의 $in 쿼리로 조회
+        version = get_data_version()
+        bodies = {child_id: _get_cached_dashboard((child_id, days, version, sections)) for child_id in ids}
+        missing = [child_id for child_id, body in bodies.items() if body is None]
         
-        # 알림 생성
-        alerts = [AlertItem(**alert) for alert in analyzer.generate_alerts(metrics_data)]
+        if missing:
+            now = datetime.now()
+            # 조회 실패 시 어떤 아이의 응답도 캐시하지 않고 500으로 응답
+            df = await get_purchase_dataframe_async(child_ids=missing, days=min(days, ANALYSIS_WINDOW_DAYS))
+            groups = dict(tuple(df.groupby('childId', sort=False))) if not df.empty else {}
+            
+            responses = await asyncio.gather(*[
+                _analyze_dashboard(groups.get(child_id, df.iloc[0:0]), now, sections) for child_id in missing
+            ])
+            for child_id, response in zip(missing, responses):
+                body = response.model_dump_json(by_alias=True).encode()
+                _set_cached_dashboard((child_id, days, version, sections), body)
+                bodies[child_id] = body
         
-        return DashboardResponse(
-            metrics=metrics,
-            weeklyTrend=weekly_trend,
-            categoryData=category_data,
-            hourlyData=hourly_data,
-            popularProducts=popular_products,
-            alerts=alerts,
-            lastUpdated=datetime.now()
-        )
+        # 아이별 직렬화된 응답을 {child_id: 응답} 형태로 이어 붙임
+        content = b'{' + b','.join(
+            json.dumps(child_id, ensure_ascii=False).encode() + b':' + body
+            for child_id, body in bodies.items()
+        ) + b'}'
+        return Response(content=content, media_type="application/json")
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"대시보드 데이터 조회 중 오류가 발생했습니다: {str(e)}")
@@ -88,16 +231,10 @@ async def get_dashboard_data(
 async def get_children_list():
     """모든 아이 목록 조회"""
     try:
-        # MongoDB에서 고유한 childId 조회
-        pipeline = [
-            {"$group": {"_id": "$childId"}},
-            {"$sort": {"_id": 1}}
-        ]
-        
-        children_cursor = async_collection.aggregate(pipeline)
-        children_list = await children_cursor.to_list(length=None)
+        # 캐시된 아이 목록 조회 (만료 시에만 MongoDB 집계)
+        child_ids = await get_children_async()
         
-        children = [ChildInfo(child_id=child["_id"]) for child in children_list if child["_id"]]
+        children = [ChildInfo(child_id=child_id) for child_id in child_ids]
         
         return ChildrenResponse(children=children)
         
@@ -107,19 +244,31 @@ async def get_children_list():
 @router.get("/health", response_model=HealthResponse)
 async def health_check():
     """헬스 체크 엔드포인트"""
+    now = datetime.now()
+    
     try:
-        # MongoDB 연결 테스트
-        count = await async_collection.count_documents({})
+        # MongoDB 연결 테스트 (컬렉션 메타데이터 기반 개수라 데이터 크기와 무관하게 빠름)
+        count = await asyncio.wait_for(
+            async_collection.estimated_document_count(),
+            timeout=HEALTH_CHECK_TIMEOUT
+        )
         
         return HealthResponse(
             status="healthy",
             database=f"MongoDB 연결 정상 (총 {count}건의 데이터)",
-            timestamp=datetime.now()
+            timestamp=now
+        )
+        
+    except asyncio.TimeoutError:
+        return HealthResponse(
+            status="unhealthy",
+            database=f"MongoDB 응답 시간 초과 ({HEALTH_CHECK_TIMEOUT}초)",
+            timestamp=now
         )
         
     except Exception as e:
         return HealthResponse(
             status="unhealthy",
             database=f"MongoDB 연결 오류: {str(e)}",
-            timestamp=datetime.now()
+            timestamp=now
         )
@@ -1,13 +1,18 @@
 from pymongo import MongoClient
 from motor.motor_asyncio import AsyncIOMotorClient
 import os
+import numpy as np
 import pandas as pd
+from collections import OrderedDict
 from datetime import datetime, timedelta
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Tuple
 from pydantic import BaseModel
 import asyncio
+import time
 from dotenv import load_dotenv
 
+from .labels import LABEL_MAPPING, encode_label_korean
+
 # 환경변수 로드
 load_dotenv()
 
@@ -16,26 +21,69 @@ MONGO_URI = os.getenv("MONGO_URI", "mongodb://15.164.219.145:27017/")
 MONGO_DB_NAME = os.getenv("MONGO_DB_NAME", "finance_app")
 COLLECTION_NAME = os.getenv("COLLECTION_NAME", "purchase_history")
 
+# 커넥션 풀 설정 (동시 대시보드 요청이 연결 획득에서 대기하지 않도록)
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "50"))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "10"))
+
 # MongoDB 클라이언트 (동기)
 client = MongoClient(MONGO_URI)
 db = client[MONGO_DB_NAME]
 collection = db[COLLECTION_NAME]
 
 # MongoDB 클라이언트 (비동기)
-async_client = AsyncIOMotorClient(MONGO_URI)
+async_client = AsyncIOMotorClient(MONGO_URI, maxPoolSize=MONGO_MAX_POOL_SIZE, minPoolSize=MONGO_MIN_POOL_SIZE)
 async_db = async_client[MONGO_DB_NAME]
 async_collection = async_db[COLLECTION_NAME]
 
-# 라벨 매핑
-LABEL_MAPPING = {
-    "FOOD": "먹이",
-    "SNACK": "간식", 
-    "ENTERTAINMENT": "오락",
-    "TOY": "장난감",
-    "EDUCATION": "교육 및 문구",
-    "ETC": "기타"
+# 데이터 버전 (이 프로세스에서 구매 데이터가 삽입될 때마다 증가, 응답 캐시 무효화에 사용)
+_data_version = 0
+
+def get_data_version() -> int:
+    """현재 데이터 버전 반환"""
+    return _data_version
+
+def _bump_data_version() -> None:
+    global _data_version
+    _data_version += 1
+
+# 아이 목록 캐시 (구매 데이터는 외부 서비스에서도 삽입되므로 주기적으로 다시 집계)
+CHILDREN_CACHE_TTL = 300  # 초
+_children_cache: Optional[set] = None
+_children_cached_at = 0.0
+
+async def get_children_async() -> List[str]:
+    """
+    구매 기록이 있는 아이 ID 목록 조회 (캐시가 만료되었을 때만 전체 집계 실행)
+    """
+    global _children_cache, _children_cached_at
+    if _children_cache is None or time.monotonic() - _children_cached_at > CHILDREN_CACHE_TTL:
+        # (childId, timestamp) 복합 인덱스의 선두 필드라 DISTINCT_SCAN으로 처리됨
+        child_ids = await async_collection.distinct("childId")
+        _children_cache = {child_id for child_id in child_ids if child_id}
+        _children_cached_at = time.monotonic()
+    return sorted(_children_cache)
+
+def _remember_child(child_id: Optional[str]) -> None:
+    """이 프로세스에서 삽입한 아이를 캐시에 바로 반영"""
+    if _children_cache is not None and child_id:
+        _children_cache.add(child_id)
+
+# 분석에 필요한 필드만 조회 (_id, _class 등은 전송/디코딩 생략)
+PURCHASE_PROJECTION = {
+    "_id": 0,
+    "type": 1,
+    "name": 1,
+    "price": 1,
+    "cnt": 1,
+    "timestamp": 1,
+    "childId": 1,
+    "productId": 1,
+    "label": 1
 }
 
+# DataFrame으로 변환할 구매 문서 필드 (PURCHASE_PROJECTION과 동일)
+PURCHASE_FIELDS = ['type', 'name', 'price', 'cnt', 'timestamp', 'childId', 'productId', 'label']
+
 # 데이터 모델
 class PurchaseHistory(BaseModel):
     _id: Optional[str] = None  # MongoDB ObjectId
@@ -68,11 +116,86 @@ def init_db():
     except Exception as e:
         print(f"MongoDB 연결 오류: {e}")
 
+async def init_db_async():
+    """앱 시작 시 조회 패턴에 맞는 인덱스 생성 및 아이 목록 캐시 준비 (비동기)"""
+    try:
+        await async_collection.create_index([("childId", 1), ("timestamp", -1)])
+        await async_collection.create_index([("timestamp", -1)])
+        print("인덱스 생성 완료")
+        
+        # 아이 목록 캐시 미리 채우기
+        await get_children_async()
+    except Exception as e:
+        print(f"MongoDB 초기화 오류: {e}")
+
 # 데이터베이스 의존성 (호환성을 위해 유지)
 def get_db():
     """MongoDB 컬렉션 반환"""
     return collection
 
+# 커서에서 한 번에 가져올 문서 수
+CURSOR_BATCH_SIZE = 1000
+
+# 조회 결과 캐시: (child_id, days, child_ids, 데이터 버전) -> (만료 시각, DataFrame)
+# 분석 코드는 전달받은 DataFrame을 수정하지 않으므로 같은 객체를 공유해도 안전
+PURCHASE_CACHE_TTL = 30  # 초
+PURCHASE_CACHE_SIZE = 128
+_purchase_cache: "OrderedDict[tuple, Tuple[float, pd.DataFrame]]" = OrderedDict()
+
+def _get_cached_purchases(key: tuple) -> Optional[pd.DataFrame]:
+    """만료되지 않은 조회 결과 반환"""
+    entry = _purchase_cache.get(key)
+    if entry is None:
+        return None
+    
+    expires_at, df = entry
+    if expires_at < time.monotonic():
+        del _purchase_cache[key]
+        return None
+    
+    _purchase_cache.move_to_end(key)
+    return df
+
+def _set_cached_purchases(key: tuple, df: pd.DataFrame) -> None:
+    """조회 결과를 캐시에 저장 (가장 오래 사용되지 않은 항목부터 제거)"""
+    _purchase_cache[key] = (time.monotonic() + PURCHASE_CACHE_TTL, df)
+    _purchase_cache.move_to_end(key)
+    while len(_purchase_cache) > PURCHASE_CACHE_SIZE:
+        _purchase_cache.popitem(last=False)
+
+def _columns_to_dataframe(columns: Dict[str, List[Any]]) -> pd.DataFrame:
+    """
+    필드별 컬럼 리스트로 DataFrame 생성 및 파생 컬럼/타입 정리
+    
+    행 단위 dict 목록을 DataFrame이 전치/타입 추론하는 대신,
+    커서를 돌며 모은 필드별 리스트로 한 번에 생성
+    """
+    df = pd.DataFrame(columns)
+    
+    # label을 한국어 카테고리로 인코딩 (분석기와 같은 매핑, 알 수 없는 라벨은 '기타')
+    df['label_korean'] = encode_label_korean(df['label'])
+    
+    # 카테고리 컬럼 추가 (기본적으로 type 값 사용)
+    df['category'] = df['type']
+    
+    # 호환성을 위해 child_id 컬럼 추가 (childId를 복사)
+    df['child_id'] = df['childId']
+    
+    # 데이터 타입 변환
+    df['timestamp'] = pd.to_datetime(df['timestamp'])
+    # 정수 컬럼은 플랫폼과 무관하게 int64로 고정 (Windows의 기본 int는 int32)
+    df['price'] = pd.to_numeric(df['price'], errors='coerce').fillna(0).astype(np.int64)
+    df['cnt'] = pd.to_numeric(df['cnt'], errors='coerce').fillna(0).astype(np.int64)
+    
+    # 총액 (가격 * 수량)은 적재 시 한 번만 계산
+    df['total_amount'] = df['price'].to_numpy() * df['cnt'].to_numpy()
+    
+    # 값이 반복되는 문자열 컬럼은 범주형으로 저장 (groupby/비교가 정수 코드로 동작)
+    for column in ['type', 'name', 'category']:
+        df[column] = df[column].astype('category')
+    
+    return df
+
 def get_purchase_data(child_id: Optional[str] = None, days: int = 7) -> pd.DataFrame:
     """
     구매 데이터를 DataFrame으로 반환
@@ -95,45 +218,23 @@ def get_purchase_data(child_id: Optional[str] = None, days: int = 7) -> pd.DataF
         if child_id:
             query["childId"] = child_id
         
-        # MongoDB에서 데이터 조회
-        cursor = collection.find(query).sort("timestamp", -1)
-        documents = list(cursor)
-        
-        if not documents:
-            return pd.DataFrame(columns=['_id', 'type', 'name', 'price', 'cnt', 'timestamp', 'childId', 'productId', 'label', 'label_korean'])
-        
-        # DataFrame으로 변환
-        df = pd.DataFrame(documents)
-        
-        # _class 필드 제거 (Spring Data MongoDB 필드)
-        if '_class' in df.columns:
-            df = df.drop('_class', axis=1)
+        # MongoDB에서 데이터 조회 (분석에 필요한 필드만)
+        cursor = collection.find(query, PURCHASE_PROJECTION).sort("timestamp", -1).batch_size(CURSOR_BATCH_SIZE)
         
-        # label을 한국어로 매핑한 컬럼 추가
-        if 'label' in df.columns:
-            df['label_korean'] = df['label'].map(LABEL_MAPPING).fillna(df['label'])
+        # 문서 리스트를 만들지 않고 바로 필드별 컬럼에 쌓음
+        columns: Dict[str, List[Any]] = {field: [] for field in PURCHASE_FIELDS}
+        for doc in cursor:
+            for field, values in columns.items():
+                values.append(doc.get(field))
         
-        # 카테고리 컬럼 추가 (type을 한국어로 매핑)
-        if 'type' in df.columns:
-            df['category'] = df['type']  # 기본적으로 type 값 사용
+        if not columns['timestamp']:
+            return pd.DataFrame(columns=['type', 'name', 'price', 'cnt', 'timestamp', 'childId', 'productId', 'label', 'label_korean'])
         
-        # 호환성을 위해 child_id 컬럼 추가 (childId를 복사)
-        if 'childId' in df.columns:
-            df['child_id'] = df['childId']
-        
-        # 데이터 타입 변환
-        if 'timestamp' in df.columns:
-            df['timestamp'] = pd.to_datetime(df['timestamp'])
-        if 'price' in df.columns:
-            df['price'] = pd.to_numeric(df['price'], errors='coerce').fillna(0).astype(int)
-        if 'cnt' in df.columns:
-            df['cnt'] = pd.to_numeric(df['cnt'], errors='coerce').fillna(0).astype(int)
-        
-        return df
+        return _columns_to_dataframe(columns)
         
     except Exception as e:
         print(f"데이터 조회 오류: {e}")
-        return pd.DataFrame(columns=['_id', 'type', 'name', 'price', 'cnt', 'timestamp', 'childId', 'productId', 'label', 'label_korean', 'category', 'child_id'])
+        return pd.DataFrame(columns=['type', 'name', 'price', 'cnt', 'timestamp', 'childId', 'productId', 'label', 'label_korean', 'category', 'child_id'])
 
 
 # 비동기 함수들
@@ -148,18 +249,13 @@ async def get_purchase_data_async(child_id: Optional[str] = None, days: int = 7)
         if child_id:
             query["childId"] = child_id
         
-        cursor = async_collection.find(query).sort("timestamp", -1)
+        cursor = async_collection.find(query, PURCHASE_PROJECTION).sort("timestamp", -1)
         documents = await cursor.to_list(length=None)
         
-        # _id 필드를 문자열로 변환하고 _class 필드 제거
+        # 한국어 라벨 추가 (_id, _class는 projection으로 이미 제외됨)
         for doc in documents:
-            if '_id' in doc:
-                doc['_id'] = str(doc['_id'])
-            if '_class' in doc:
-                del doc['_class']
-            # 한국어 라벨 추가
             if 'label' in doc:
-                doc['label_korean'] = LABEL_MAPPING.get(doc['label'], doc['label'])
+                doc['label_korean'] = LABEL_MAPPING.get(doc['label'], '기타')
         
         return documents
         
@@ -167,12 +263,65 @@ async def get_purchase_data_async(child_id: Optional[str] = None, days: int = 7)
         print(f"비동기 데이터 조회 오류: {e}")
         return []
 
+async def get_purchase_dataframe_async(child_id: Optional[str] = None, days: int = 7,
+                                       child_ids: Optional[List[str]] = None) -> pd.DataFrame:
+    """
+    비동기적으로 구매 데이터를 DataFrame으로 조회 (조회 중 이벤트 루프를 막지 않음)
+    
+    Args:
+        child_id: 특정 아이 ID (None이면 모든 아이)
+        days: 조회할 일수
+        child_ids: 여러 아이를 한 번의 쿼리로 조회할 때의 ID 목록
+    
+    Returns:
+        pd.DataFrame: 구매 데이터
+    
+    Raises:
+        Exception: DB 조회 실패 시 (빈 결과와 구분되도록 그대로 전달, 실패한 조회는 캐시하지 않음)
+    """
+    # 같은 조건의 최근 조회 결과 재사용 (구매는 외부 서비스가 기록하므로 주로 TTL 만료로 갱신됨)
+    cache_key = (child_id, days, tuple(child_ids) if child_ids else None, _data_version)
+    cached = _get_cached_purchases(cache_key)
+    if cached is not None:
+        return cached
+    
+    try:
+        start_date = datetime.now() - timedelta(days=days)
+        query = {"timestamp": {"$gte": start_date}}
+        
+        if child_ids:
+            query["childId"] = {"$in": child_ids}
+        elif child_id:
+            query["childId"] = child_id
+        
+        cursor = async_collection.find(query, PURCHASE_PROJECTION).sort("timestamp", -1).batch_size(CURSOR_BATCH_SIZE)
+        
+        # 전체 문서 리스트를 만들지 않고 배치 단위로 받아 바로 컬럼에 쌓음
+        columns: Dict[str, List[Any]] = {field: [] for field in PURCHASE_FIELDS}
+        async for doc in cursor:
+            for field, values in columns.items():
+                values.append(doc.get(field))
+        
+        if not columns['timestamp']:
+            df = pd.DataFrame(columns=['type', 'name', 'price', 'cnt', 'timestamp', 'childId', 'productId', 'label', 'label_korean'])
+        else:
+            df = _columns_to_dataframe(columns)
+        
+        _set_cached_purchases(cache_key, df)
+        return df
+        
+    except Exception as e:
+        print(f"비동기 데이터 조회 오류: {e}")
+        raise
+
 async def insert_purchase_data_async(data: Dict[str, Any]) -> bool:
     """
     비동기적으로 구매 데이터 삽입
     """
     try:
         result = await async_collection.insert_one(data)
+        _bump_data_version()
+        _remember_child(data.get("childId"))
         return result.inserted_id is not None
     except Exception as e:
         print(f"데이터 삽입 오류: {e}")
@@ -184,6 +333,8 @@ def insert_purchase_data(data: Dict[str, Any]) -> bool:
     """
     try:
         result = collection.insert_one(data)
+        _bump_data_version()
+        _remember_child(data.get("childId"))
         return result.inserted_id is not None
     except Exception as e:
         print(f"데이터 삽입 오류: {e}")
@@ -0,0 +1,26 @@
+import numpy as np
+import pandas as pd
+
+# 원본 label -> 한국어 카테고리 (로더와 분석기가 공유, 정의 순서가 카테고리 고정 순서)
+LABEL_MAPPING = {
+    'SNACK': '간식',
+    'ENTERTAINMENT': '오락',
+    'TOY': '장난감',
+    'EDUCATION': '교육 및 문구',
+    'FOOD': '먹이',      # 게임 캐릭터 먹이를 별도 카테고리로 분류
+    'ETC': '기타'
+}
+
+# 카테고리 고정 순서 (Categorical 코드 순서로도 사용)
+CATEGORIES = list(LABEL_MAPPING.values())
+
+def encode_label_korean(labels: pd.Series) -> pd.Categorical:
+    """
+    원본 label을 한국어 카테고리 Categorical로 변환
+    
+    정수 코드로 바로 생성해 문자열 매핑/재해싱을 생략하며,
+    알 수 없거나 비어있는 라벨(코드 -1)은 '기타'로 분류
+    """
+    codes = pd.Categorical(labels, categories=list(LABEL_MAPPING)).codes
+    codes = np.where(codes < 0, CATEGORIES.index('기타'), codes)
+    return pd.Categorical.from_codes(codes, categories=CATEGORIES)
@@ -1,13 +1,27 @@
+import asyncio
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 
 from .api.analytics import router as analytics_router
+from .database import init_db_async
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """앱 시작 시 MongoDB 인덱스 준비 (DB가 느리거나 내려가 있어도 서버 시작을 막지 않도록 백그라운드 실행)"""
+    init_task = asyncio.create_task(init_db_async())
+    yield
+    if not init_task.done():
+        init_task.cancel()
 
 # FastAPI 앱 초기화
 app = FastAPI(
     title="아이 습관 분석 API",
     description="구매 데이터 기반 아이 소비 패턴 분석 시스템",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # CORS 설정
@@ -19,6 +33,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# 응답 압축 (대시보드 JSON 등 1KB 이상 응답만)
+app.add_middleware(GZipMiddleware, minimum_size=1024, compresslevel=6)
+
 # 라우터 등록
 app.include_router(analytics_router)
 